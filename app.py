@@ -1,19 +1,21 @@
 import streamlit as st
-from supabase import create_client, Client
-import random
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import json
 import time
-from datetime import datetime, timezone
-import pandas as pd
+import db
+from assignment import build_assignments, AssignmentError
+from participant_import import missing_fields, read_records, import_participants
 
 # --- 1. SETUP & SECRETS ---
 try:
-    url = st.secrets["SUPABASE_URL"]
-    key = st.secrets["SUPABASE_KEY"]
+    if db.backend_name() == "supabase":
+        url = st.secrets["SUPABASE_URL"]
+        key = st.secrets["SUPABASE_KEY"]
 except:
     st.error("Secrets not found. Please set SUPABASE_URL and SUPABASE_KEY.")
     st.stop()
 
-supabase: Client = create_client(url, key)
+store = db.get_storage()
 
 st.set_page_config(page_title="Team Secret Santa", page_icon="🎅", layout="centered")
 
@@ -29,91 +31,75 @@ hide_streamlit_style = """
 st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 
 # --- 3. HELPER FUNCTIONS ---
-def get_config(key):
-    response = supabase.table('config').select('value').eq('key', key).execute()
-    if response.data:
-        return response.data[0]['value']
-    return None
-
 def set_config(key, value):
-    supabase.table('config').update({'value': value}).eq('key', key).execute()
+    store.set_config(key, value)
+    db.invalidate('config', 'versions')
 
 def login(email, phrase):
-    res = supabase.table('participants').select('*').eq('email', email).eq('passphrase', phrase).execute()
-    return res.data[0] if res.data else None
-
-def get_assignment(santa_email):
-    res = supabase.table('assignments').select('*').eq('santa_email', santa_email).execute()
-    return res.data[0] if res.data else None
-
-def get_user_by_email(email):
-    res = supabase.table('participants').select('*').eq('email', email).execute()
-    return res.data[0] if res.data else None
-
-def get_all_participants_names():
-    res = supabase.table('participants').select('name, email').eq('is_admin', False).execute()
-    return res.data
+    return store.login(email, phrase)
 
-def calculate_top_5_speed_winners():
-    # Helper to identify who is in the Top 5 (to exclude them from voting)
-    response = supabase.table('assignments').select('recipient_email, guess_timestamp, is_correct_guess').execute()
-    if not response.data: return []
-    
-    guessed_only = [d for d in response.data if d['guess_timestamp'] is not None]
-    correct_guesses = [d for d in guessed_only if d['is_correct_guess']]
-    correct_guesses.sort(key=lambda x: x['guess_timestamp'])
-    
-    # Return list of emails of top 5 winners
-    return [x['recipient_email'] for x in correct_guesses[:5]]
-
-def run_assignment():
-    users = supabase.table('participants').select('email').eq('is_admin', False).execute()
-    emails = [u['email'] for u in users.data]
+def run_assignment(seed=None):
+    users = list(db.scan('participants', 'email, team, household', 'email', eq={'is_admin': False}))
+    emails = [u['email'] for u in users]
     
     if len(emails) < 2:
         st.error(f"Need at least 2 participants. Admin is excluded.")
         return
 
-    santas = emails.copy()
-    recipients = emails.copy()
-    
-    # Generate Unique Tokens (e.g., 101, 102...)
-    tokens = random.sample(range(101, 999), len(emails))
-    
-    attempts = 0
-    while True:
-        random.shuffle(recipients)
-        if all(s != r for s, r in zip(santas, recipients)):
-            break
-        attempts += 1
-        if attempts > 100:
-            st.error("Could not generate valid pairs.")
-            return
-
-    data = []
-    for i, (s, r) in enumerate(zip(santas, recipients)):
-        data.append({
-            'santa_email': s, 
-            'recipient_email': r,
-            'recipient_token': str(tokens[i]) # Assign random token to the pair
-        })
-    
+    # Exclusion rules: same team, same household, or last year's pair
+    groups = {u['email']: {f"{col}:{u[col]}" for col in ('team', 'household') if u.get(col)} for u in users}
+    previous = db.scan('previous_pairs', 'santa_email, recipient_email', ('santa_email', 'recipient_email'))
+    forbidden = {(p['santa_email'], p['recipient_email']) for p in previous}
+
     try:
-        supabase.table('assignments').delete().neq('status', 'impossible').execute()
-        supabase.table('votes').delete().neq('voter_email', 'impossible').execute() 
-    except:
-        pass 
+        data = build_assignments(emails, seed=seed, groups=groups, forbidden_pairs=forbidden)
+    except AssignmentError as e:
+        st.error(f"Could not generate valid pairs. {e}")
+        return
     
-    supabase.table('assignments').insert(data).execute()
-    set_config('stage', 'token_reveal')
+    # Stage the new pairs in chunks, then swap them in with one transaction so
+    # logged-in players never see an empty assignments table
+    run_id = store.begin_assignment_run()
+    if run_id is None:
+        st.warning("Another assignment run is already in progress.")
+        return
+
+    try:
+        for chunk in db.chunked(data, db.WRITE_CHUNK_SIZE):
+            store.stage_assignments(run_id, chunk)
+        store.publish_assignment_run(run_id)
+    except Exception as e:
+        store.abort_assignment_run(run_id)
+        st.error(f"Assignment run failed, previous assignments kept. {e}")
+        return
+    finally:
+        db.invalidate('config', 'versions', 'assignments', 'votes', 'leaderboard')
+
     st.success(f"Assignments & Tokens generated for {len(emails)} people!")
 
+# Seconds between the background checks for stage changes and new sign-ups
+CHANGE_POLL_SECONDS = 5
+
+@st.fragment(run_every=CHANGE_POLL_SECONDS)
+def watch_for_changes(seen_versions):
+    # Only this fragment reruns on the timer, and it reads a tiny counter table
+    # through the shared cache; the full page reruns only when a counter moved
+    ctx = get_script_run_ctx()
+    if ctx and ctx.fragment_ids_this_run:
+        db.profiler.begin_poll(ctx.session_id)
+    if db.fetch_versions() != seen_versions:
+        st.rerun()
+
 # --- 4. MAIN UI LOGIC ---
 st.title("🎄 Team Secret Santa")
 
 if 'user' not in st.session_state:
     st.session_state.user = None
 
+_run_ctx = get_script_run_ctx()
+db.profiler.begin_rerun(_run_ctx.session_id if _run_ctx else None,
+                        st.session_state.user['email'] if st.session_state.user else None)
+
 # A. LOGIN / SIGNUP SCREEN
 if not st.session_state.user:
     tab1, tab2 = st.tabs(["Login", "Signup"])
@@ -167,28 +153,21 @@ if not st.session_state.user:
         
         if st.button("Join"):
             # --- STRICT VALIDATION START ---
-            missing = []
-            if not new_email: missing.append("Email")
-            if not new_name: missing.append("Name")
-            if not new_phrase: missing.append("Passphrase")
-            if not c1: missing.append("Clue 1")
-            if not c2: missing.append("Clue 2")
-            if not c3: missing.append("Clue 3")
-            if not sq1: missing.append("Star Question 1")
-            if not sq2: missing.append("Star Question 2")
-            if not sq3: missing.append("Star Question 3")
-            if not consent: missing.append("Consent Checkbox")
+            # Same rules as the admin bulk import (participant_import.py)
+            new_row = {
+                'email': new_email, 'name': new_name, 'passphrase': new_phrase,
+                'clue_1': c1, 'clue_2': c2, 'clue_3': c3,
+                'star_q1': sq1, 'star_q2': sq2, 'star_q3': sq3
+            }
+            missing = missing_fields(new_row, consent)
 
             if len(missing) > 0:
                 st.error(f"⚠️ You cannot join yet! Please answer: {', '.join(missing)}")
             else:
             # --- VALIDATION PASSED ---
                 try:
-                    supabase.table('participants').insert({
-                        'email': new_email, 'name': new_name, 'passphrase': new_phrase,
-                        'clue_1': c1, 'clue_2': c2, 'clue_3': c3,
-                        'star_q1': sq1, 'star_q2': sq2, 'star_q3': sq3
-                    }).execute()
+                    store.add_participant(new_row)
+                    db.invalidate('participants', 'versions')
                     st.success("Signed up! Please Log In.")
                 except Exception as e:
                     st.error(f"Error: {e}")
@@ -205,7 +184,12 @@ else:
         st.session_state.user = None
         st.rerun()
         
-    stage = get_config('stage')
+    # Everything below reads from this one snapshot instead of querying per widget;
+    # votes and the leaderboard are only fetched by the sections that show them
+    versions = db.fetch_versions()
+    snap = db.load_snapshot('config', 'participants', 'assignments', versions=versions)
+    stage = snap.stage
+    db.profiler.set_stage(stage)
     
     # --- ADMIN VIEW ---
     if user['is_admin']:
@@ -216,11 +200,27 @@ else:
         col1, col2 = st.columns(2)
         with col1:
             if stage == 'signup':
+                seed = st.number_input("Draw Seed (optional)", value=None, step=1, help="Reuse a seed to reproduce the same draw.")
                 if st.button("Generate Assignments (Exclude Me)"):
-                    run_assignment()
+                    run_assignment(None if seed is None else int(seed))
             else:
                 st.warning("Assignments Locked.")
             
+            if stage == 'signup':
+                with st.expander("📥 Bulk Import Participants"):
+                    st.caption("CSV, JSON or JSON Lines with email, name, passphrase, clue_1-3, star_q1-3 and consent "
+                               "(yes/true/1), plus optional team and household. Existing emails are updated.")
+                    upload = st.file_uploader("Participant file", type=['csv', 'json', 'jsonl', 'ndjson'])
+                    if upload is not None and st.button("Import Participants"):
+                        admins = {p['email'] for p in snap.participants if p['is_admin']}
+                        report = import_participants(read_records(upload, upload.name), store.upsert_participants,
+                                                     chunk_size=db.WRITE_CHUNK_SIZE, protected=admins)
+                        db.invalidate('participants', 'versions')
+                        st.success(f"Imported {report.imported} participants.")
+                        if report.errors:
+                            st.warning(f"{len(report.errors)} problems found:")
+                            st.dataframe(report.errors, hide_index=True)
+            
             st.write("---")
             st.write("**Game Flow Control**")
             stage_order = ['signup', 'token_reveal', 'gift_hunt', 'star_voting', 'grand_reveal']
@@ -235,47 +235,80 @@ else:
                  if st.button("🚀 TRIGGER FINAL BALLOONS"):
                      st.balloons()
 
+            st.write("---")
+            with st.expander("🔌 Connection Pool"):
+                st.json(db.pool_stats.snapshot())
+
         with col2:
              st.write("**Participant Status**")
-             all_users = supabase.table('participants').select('email, name').eq('is_admin', False).execute().data
-             all_assigns = supabase.table('assignments').select('*').execute().data
+             progress = db.fetch_progress()
+             c1, c2, c3, c4 = st.columns(4)
+             c1.metric("Received", f"{progress['received']}/{progress['participants']}")
+             c2.metric("Opened", progress['opened'])
+             c3.metric("Guessed", progress['guessed'])
+             c4.metric("Voted", progress['voted'])
              
-             status_data = []
-             for u in all_users:
-                 assign = next((a for a in all_assigns if a['recipient_email'] == u['email']), None)
-                 token = assign['recipient_token'] if assign else "-"
-                 status_data.append({"Name": u['name'], "Token": token})
-             
-             st.dataframe(pd.DataFrame(status_data), hide_index=True)
+             status_data = [{
+                 "Name": r['name'],
+                 "Token": r['recipient_token'] or "-",
+                 "Status": r['status'] or "-",
+                 "Guesses": r['guess_count'],
+                 "Found Santa": r['is_correct_guess'],
+                 "Voted": r['has_voted'],
+             } for r in db.fetch_participant_status()]
+             st.dataframe(status_data, hide_index=True)
+
+        with st.expander("📈 Query Profile"):
+            profile = db.profiler.report()
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric("Reruns", profile['reruns'])
+            m2.metric("DB Calls", profile['calls'])
+            m3.metric("Calls / Rerun", profile['calls_per_rerun'] or 0)
+            m4.metric("Change-Check Calls", profile['poll_calls'])
+            st.caption(f"Sessions idle for {db.profiler.SESSION_IDLE_SECONDS // 60} minutes drop out of the session table.")
+            st.write("**Hottest Queries** (total time)")
+            st.dataframe(profile['hottest_queries'][:10], hide_index=True)
+            st.write("**By Stage**")
+            st.dataframe(profile['by_stage'], hide_index=True)
+            st.write("**By Session**")
+            st.dataframe(profile['by_session'], hide_index=True)
+            p1, p2 = st.columns(2)
+            p1.download_button("Download JSON", json.dumps(profile, indent=2), file_name="query_profile.json", mime="application/json")
+            if p2.button("Reset Profile"):
+                db.profiler.reset()
+                st.rerun()
 
     st.divider()
 
     # --- PARTICIPANT VIEW ---
     if not user['is_admin']:
+        watch_for_changes(versions)
         
         # 1. WAITING ROOM
         if stage == 'signup':
             st.subheader("☕ The Waiting Room")
             st.warning("All the users have not signed up yet! Please wait.")
             st.write("### Who is already here?")
-            participants = supabase.table('participants').select('name').eq('is_admin', False).execute().data
-            for p in participants:
+            for p in snap.players():
                 st.write(f"- {p['name']}")
-            st.caption("Refresh occasionally.")
+            st.caption("This page updates by itself when the game moves on.")
             st.stop()
 
-        assignment = get_assignment(user['email'])
+        assignment = snap.assignment_for_santa(user['email'])
         if not assignment:
             st.error("Game Started. You have no assignment (Late signup?).")
             st.stop()
             
-        target = get_user_by_email(assignment['recipient_email'])
+        target = snap.participant(assignment['recipient_email'])
         
-        # --- TABS ---
-        tab_santa, tab_recipient, tab_leaderboard, tab_star, tab_help = st.tabs(["🎅 My Mission", "🎁 My Gift", "🏆 Speed Winners", "🌟 Star Game", "❓ Help"])
+        # --- SECTIONS ---
+        # Unlike st.tabs, which runs every tab body on each rerun, only the
+        # selected section below executes (and loads its data).
+        section = st.radio("Section", ["🎅 My Mission", "🎁 My Gift", "🏆 Speed Winners", "🌟 Star Game", "❓ Help"],
+                           key="section", horizontal=True, label_visibility="collapsed")
 
         # --- TAB 1: SANTA MISSION (BLIND) ---
-        with tab_santa:
+        if section == "🎅 My Mission":
             st.subheader("YOUR MISSION")
             
             if stage == 'token_reveal':
@@ -298,12 +331,13 @@ else:
             st.write("📝 **Leave a Clue About YOURSELF**")
             sc1 = st.text_input("Your Clue", value=assignment.get('santa_clue_1') or "")
             if st.button("Save My Identity Clue"):
-                supabase.table('assignments').update({'santa_clue_1': sc1}).eq('santa_email', user['email']).execute()
+                store.save_santa_clue(user['email'], sc1)
+                db.invalidate('assignments')
                 st.toast("Clue Saved!")
 
         # --- TAB 2: RECIPIENT BOX ---
-        with tab_recipient:
-            my_row = supabase.table('assignments').select('*').eq('recipient_email', user['email']).execute().data[0]
+        elif section == "🎁 My Gift":
+            my_row = snap.assignment_for_recipient(user['email'])
             
             if stage == 'token_reveal':
                 st.info("Wait for the Admin to start the Gift Hunt!")
@@ -317,13 +351,16 @@ else:
                 guesses_used = my_row.get('guess_count', 0)
                 
                 if status == 'assigned':
-                    st.button("📦 I found & RECEIVED my gift", 
-                              on_click=lambda: supabase.table('assignments').update({'status': 'received'}).eq('recipient_email', user['email']).execute())
+                    def mark_received():
+                        store.set_gift_status(user['email'], 'received')
+                        db.invalidate('assignments')
+                    st.button("📦 I found & RECEIVED my gift", on_click=mark_received)
                 
                 elif status == 'received':
                     st.success("Gift in hand!")
                     if st.button("🎁 I have OPENED my gift"):
-                         supabase.table('assignments').update({'status': 'opened'}).eq('recipient_email', user['email']).execute()
+                         store.set_gift_status(user['email'], 'opened')
+                         db.invalidate('assignments')
                          st.rerun()
 
                 elif status in ['opened', 'revealed']:
@@ -335,70 +372,57 @@ else:
                     
                     if not my_row.get('is_correct_guess') and guesses_used < 2:
                         st.write("#### ⚡ Fastest Finger First!")
-                        people = get_all_participants_names()
+                        people = snap.players()
                         options = {p['name']: p['email'] for p in people if p['email'] != user['email'] and p['email'] != my_row.get('first_wrong_guess')}
                         guess_name = st.selectbox("Who is it?", ["Select..."] + list(options.keys()))
                         
                         if st.button("🔒 Lock In Guess"):
                             if guess_name != "Select...":
-                                guessed_email = options[guess_name]
-                                is_correct = (guessed_email == my_row['santa_email'])
-                                update_data = {'guess_count': guesses_used + 1, 'guess_timestamp': datetime.now(timezone.utc).isoformat()}
-                                if is_correct:
-                                    update_data['is_correct_guess'] = True
-                                    update_data['guess_email'] = guessed_email
+                                # Validated, counted and timestamped in one atomic call
+                                result = store.lock_in_guess(user['email'], options[guess_name])
+                                db.invalidate('assignments')
+                                if not result:
+                                    st.warning("That guess was not counted (already locked in?).")
                                 else:
-                                    if guesses_used == 0: update_data['first_wrong_guess'] = guessed_email
-                                supabase.table('assignments').update(update_data).eq('recipient_email', user['email']).execute()
-                                st.rerun()
+                                    if result['is_correct_guess']: db.invalidate('leaderboard')
+                                    st.rerun()
                                 
                     elif my_row.get('is_correct_guess'):
                          st.success("✅ CORRECT!")
                          if stage == 'grand_reveal':
-                            santa_info = get_user_by_email(my_row['santa_email'])
                             st.balloons()
-                            st.markdown(f"### Santa: **{santa_info['name']}**")
+                            st.markdown(f"### Santa: **{snap.name_of(my_row['santa_email'])}**")
                     else:
                         st.error("❌ Out of guesses!")
                         if stage == 'grand_reveal':
-                            santa_info = get_user_by_email(my_row['santa_email'])
                             st.balloons()
-                            st.markdown(f"### Santa: **{santa_info['name']}**")
+                            st.markdown(f"### Santa: **{snap.name_of(my_row['santa_email'])}**")
 
         # --- TAB 3: SPEED WINNERS ---
-        with tab_leaderboard:
+        elif section == "🏆 Speed Winners":
             st.subheader("🏆 Top 5 Speed Winners")
-            response = supabase.table('assignments').select('recipient_email, guess_timestamp, is_correct_guess').execute()
             
-            top_5_emails = [] 
-            if response.data:
-                 guessed_only = [d for d in response.data if d['guess_timestamp'] is not None]
-                 correct_guesses = [d for d in guessed_only if d['is_correct_guess']]
-                 correct_guesses.sort(key=lambda x: x['guess_timestamp'])
-                 
-                 top_5_emails = [x['recipient_email'] for x in correct_guesses[:5]]
-                 
-                 if not correct_guesses:
+            if snap.assignments:
+                 if not snap.leaderboard:
                      st.write("No correct guesses yet...")
                  else:
-                     for idx, entry in enumerate(correct_guesses):
-                         user_info = get_user_by_email(entry['recipient_email'])
-                         if user_info:
+                     for idx, entry in enumerate(snap.leaderboard):
+                         name = snap.name_of(entry['recipient_email'])
+                         if name:
                              rank = idx + 1
                              medal = "🥇" if rank == 1 else "🥈" if rank == 2 else "🥉" if rank == 3 else f"#{rank}"
-                             if rank <= 5:
-                                 st.write(f"### {medal} {user_info['name']}")
-                             if rank == 5:
-                                 st.caption("--- WINNERS CIRCLE CLOSED ---")
+                             st.write(f"### {medal} {name}")
+                 if snap.winners_circle_closed:
+                     st.caption("--- WINNERS CIRCLE CLOSED ---")
 
         # --- TAB 4: STAR GAME (VOTING) ---
-        with tab_star:
+        elif section == "🌟 Star Game":
             st.subheader("🌟 The Secret Santa Star")
             
             if stage != 'star_voting' and stage != 'grand_reveal':
                 st.info("This game unlocks after the gifts are opened!")
             else:
-                top_5 = calculate_top_5_speed_winners()
+                top_5 = snap.top_5_speed_winners
                 
                 if user['email'] in top_5:
                     st.success("🏆 You are a Speed Winner! You are watching from the VIP Lounge.")
@@ -407,20 +431,41 @@ else:
                     st.write("Vote for the person with the most interesting answers!")
                     st.caption("You cannot vote for yourself.")
                     
-                    my_vote = supabase.table('votes').select('*').eq('voter_email', user['email']).execute().data
+                    my_vote = snap.vote_by(user['email'])
                     
                     if my_vote:
                         st.success("✅ Vote Cast! Waiting for results.")
                     else:
-                        candidates = supabase.table('participants').select('*').eq('is_admin', False).execute().data
-                        # FILTER: Exclude Top 5 AND Exclude Self
-                        valid_candidates = [c for c in candidates if c['email'] not in top_5 and c['email'] != user['email']]
+                        # One page of star answers at a time, keyed by opaque ids and
+                        # shuffled per voter; names and emails never reach this page
+                        cursors = st.session_state.setdefault('star_cursors', [None])
+                        # Pages are per voter, so they live in this session. A new sign-up
+                        # or a new Speed Winner changes who is votable, so either one
+                        # drops the saved pages and they are fetched again
+                        pages_version = (user['email'], versions.get('participants'), tuple(top_5))
+                        if st.session_state.get('star_pages_version') != pages_version:
+                            st.session_state.star_pages_version = pages_version
+                            st.session_state.star_pages = {}
+                        pages = st.session_state.star_pages
+                        if cursors[-1] not in pages:
+                            pages[cursors[-1]] = db.fetch_star_profiles(user['email'], cursors[-1])
+                        profiles = pages[cursors[-1]]
+                        offset = (len(cursors) - 1) * db.STAR_PAGE_SIZE
                         
-                        vote_choice = st.selectbox("Choose a Profile to Review:", ["Select..."] + [f"Anonymous Profile {i+1}" for i in range(len(valid_candidates))])
+                        vote_choice = st.selectbox("Choose a Profile to Review:", ["Select..."] + [f"Anonymous Profile {offset + i + 1}" for i in range(len(profiles))],
+                                                   key=f"star_pick_{len(cursors)}")
+                        
+                        prev_col, next_col = st.columns(2)
+                        if len(cursors) > 1 and prev_col.button("◀ Previous Profiles"):
+                            cursors.pop()
+                            st.rerun()
+                        if len(profiles) == db.STAR_PAGE_SIZE and next_col.button("More Profiles ▶"):
+                            cursors.append(profiles[-1]['sort_key'])
+                            st.rerun()
                         
                         if vote_choice != "Select...":
-                            idx = int(vote_choice.split(" ")[2]) - 1
-                            cand = valid_candidates[idx]
+                            idx = int(vote_choice.split(" ")[2]) - offset - 1
+                            cand = profiles[idx]
                             
                             st.info("👇 Read their Answers below and Vote if you like them!")
                             st.markdown(f"""
@@ -437,27 +482,27 @@ else:
                             """, unsafe_allow_html=True)
                             
                             if st.button("⭐ Vote for this Profile"):
-                                supabase.table('votes').insert({'voter_email': user['email'], 'voted_for_email': cand['email']}).execute()
-                                st.rerun()
+                                counted = store.vote_for_profile(user['email'], cand['profile_id'], db.LEADERBOARD_SIZE)
+                                db.invalidate('votes')
+                                if not counted:
+                                    st.warning("That vote was not counted (already voted?).")
+                                else:
+                                    st.rerun()
 
                 if stage == 'grand_reveal':
                     st.divider()
                     st.subheader("🌟 AND THE STAR IS...")
                     
-                    votes = supabase.table('votes').select('voted_for_email').execute().data
-                    if votes:
-                        vote_counts = pd.Series([v['voted_for_email'] for v in votes]).value_counts()
-                        winner_email = vote_counts.idxmax()
-                        winner_info = get_user_by_email(winner_email)
-                        
+                    star = snap.star
+                    if star:
                         st.balloons()
-                        st.markdown(f"# 🌟 {winner_info['name']} 🌟")
-                        st.write(f"With {vote_counts.max()} votes!")
+                        st.markdown(f"# 🌟 {snap.name_of(star['voted_for_email'])} 🌟")
+                        st.write(f"With {star['votes']} votes!")
                     else:
                         st.write("No votes cast yet.")
 
         # --- TAB 5: HELP ---
-        with tab_help:
+        elif section == "❓ Help":
             st.header("📖 How to Play")
             st.info("This is a **Double-Blind** Secret Santa!")
             st.subheader("1️⃣ Before Event")
@@ -0,0 +1,161 @@
+"""Secret Santa pairing engine.
+
+Pure Python with no Streamlit or Supabase imports, so it can be benchmarked and
+reused outside the app. Nobody ever draws themselves; optional exclusion rules
+keep people from drawing a teammate, a housemate or last year's recipient.
+"""
+import random
+
+# Random re-draws allowed per rule violation before a fresh cycle is drawn
+REPAIR_ATTEMPTS = 1000
+# Fresh cycles tried before falling back to an exact bipartite matching
+RESTARTS = 20
+
+
+class AssignmentError(Exception):
+    """Raised when the participants and rules admit no valid pairing."""
+
+
+def token_range(n):
+    """Smallest fixed-width token range with room for n distinct tokens.
+
+    Small events keep the familiar 3-digit tokens (101-998); bigger ones get
+    one more digit each time the current width runs out.
+    """
+    digits = 3
+    while 10 ** digits - 10 ** (digits - 1) - 2 < n:
+        digits += 1
+    return range(10 ** (digits - 1) + 1, 10 ** digits - 1)
+
+
+def single_cycle(n, rng):
+    """Sattolo's algorithm: a uniformly random n-cycle, so p[i] != i for all i."""
+    p = list(range(n))
+    for i in range(n - 1, 0, -1):
+        j = rng.randrange(i)
+        p[i], p[j] = p[j], p[i]
+    return p
+
+
+def repair(p, allowed, rng):
+    """Swap recipients until every santa i may give to p[i]; False if stuck.
+
+    Swaps keep p a permutation, and allowed() rules out fixed points. Pairwise
+    swaps cannot reach every fix (some need a 3-way rotation), hence the
+    restarts and the matching fallback in build_assignments().
+    """
+    n = len(p)
+    for i in range(n):
+        if allowed(i, p[i]):
+            continue
+        for _ in range(REPAIR_ATTEMPTS):
+            j = rng.randrange(n)
+            if allowed(i, p[j]) and allowed(j, p[i]):
+                p[i], p[j] = p[j], p[i]
+                break
+        else:
+            return False
+    return True
+
+
+def perfect_matching(adj):
+    """Hopcroft-Karp: match every left vertex i to a distinct right vertex in adj[i].
+
+    Returns the list of matches, or None when no perfect matching exists.
+    Runs in O(E * sqrt(V)); the DFS is iterative so large inputs are safe.
+    """
+    n = len(adj)
+    match_l, match_r = [-1] * n, [-1] * n
+    inf = float('inf')
+    while True:
+        # BFS layers from every free left vertex
+        dist = [inf] * n
+        queue = [i for i in range(n) if match_l[i] == -1]
+        for i in queue:
+            dist[i] = 0
+        found = False
+        for i in queue:
+            for r in adj[i]:
+                j = match_r[r]
+                if j == -1:
+                    found = True
+                elif dist[j] == inf:
+                    dist[j] = dist[i] + 1
+                    queue.append(j)
+        if not found:
+            break
+        # DFS for vertex-disjoint shortest augmenting paths
+        it = [0] * n
+        for root in range(n):
+            if match_l[root] != -1:
+                continue
+            stack, path = [root], []
+            while stack:
+                i = stack[-1]
+                if it[i] == len(adj[i]):
+                    dist[i] = inf
+                    stack.pop()
+                    if path:
+                        path.pop()
+                    continue
+                r = adj[i][it[i]]
+                it[i] += 1
+                j = match_r[r]
+                if j == -1:
+                    path.append(r)
+                    for left, right in zip(stack, path):
+                        match_l[left], match_r[right] = right, left
+                    break
+                if dist[j] == dist[i] + 1:
+                    path.append(r)
+                    stack.append(j)
+    return None if -1 in match_l else match_l
+
+
+def build_assignments(emails, seed=None, groups=None, forbidden_pairs=()):
+    """Pair every email with a recipient and a unique gift token.
+
+    groups maps an email to labels such as ``{'team:sales', 'home:12'}``; two
+    people sharing a label never draw each other. forbidden_pairs holds
+    ``(santa_email, recipient_email)`` pairs to avoid, e.g. last year's draw.
+    Runs in O(n) plus O(1) expected work per rule violation when the rules
+    leave plenty of choice; otherwise falls back to an O(n^2) exact matching
+    and raises AssignmentError only if no valid pairing exists.
+    """
+    n = len(emails)
+    if n < 2:
+        raise AssignmentError("Need at least 2 participants.")
+
+    rng = random.Random(seed)
+    groups = groups or {}
+    forbidden_pairs = set(forbidden_pairs)
+    labels = [frozenset(groups.get(e) or ()) for e in emails]
+
+    def allowed(s, r):
+        if s == r or labels[s] & labels[r]:
+            return False
+        return not forbidden_pairs or (emails[s], emails[r]) not in forbidden_pairs
+
+    p = single_cycle(n, rng)
+    if groups or forbidden_pairs:
+        for _ in range(RESTARTS):
+            if repair(p, allowed, rng):
+                break
+            p = single_cycle(n, rng)
+        else:
+            # Tightly constrained events: search all allowed pairs exactly,
+            # in shuffled order so the draw stays random
+            adj = []
+            for s in range(n):
+                recipients = [r for r in range(n) if allowed(s, r)]
+                rng.shuffle(recipients)
+                adj.append(recipients)
+            p = perfect_matching(adj)
+            if p is None:
+                raise AssignmentError("The exclusion rules leave no valid pairing for these participants.")
+
+    tokens = rng.sample(token_range(n), n)
+    return [
+        {'santa_email': emails[i], 'recipient_email': emails[p[i]], 'recipient_token': str(tokens[i])}
+        for i in range(n)
+    ]
@@ -0,0 +1,72 @@
+"""Check assignment.build_assignments on small, tightly constrained events,
+then time it at event sizes well past a real office.
+
+    python bench/bench_assignment.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from assignment import build_assignments  # noqa: E402
+
+SIZES = [100, 1_000, 10_000, 50_000]
+
+
+def _check(rows, groups, forbidden):
+    santas = {r['santa_email'] for r in rows}
+    recipients = {r['recipient_email'] for r in rows}
+    assert santas == recipients and len(rows) == len(santas)
+    assert len({r['recipient_token'] for r in rows}) == len(rows)
+    for r in rows:
+        s, t = r['santa_email'], r['recipient_email']
+        assert s != t and (s, t) not in forbidden
+        assert not (groups.get(s, set()) & groups.get(t, set()))
+
+
+def bench(n, constrained):
+    emails = [f"user{i}@example.com" for i in range(n)]
+    groups, forbidden = {}, set()
+    if constrained:
+        # teams of 10, households of 2, and last year's pairs as a simple shift
+        groups = {e: {f"team:{i // 10}", f"home:{i // 2}"} for i, e in enumerate(emails)}
+        forbidden = {(emails[i], emails[(i + 37) % n]) for i in range(n)}
+    start = time.perf_counter()
+    rows = build_assignments(emails, seed=n, groups=groups, forbidden_pairs=forbidden)
+    elapsed = time.perf_counter() - start
+    _check(rows, groups, forbidden)
+    return elapsed
+
+
+def _small_cases():
+    """Tightly constrained events where pairwise repair alone gets stuck."""
+    ten = [f"user{i}@example.com" for i in range(10)]
+    four = ten[:4]
+    six = ten[:6]
+    yield ("10 people, 2 teams, households of 2, 1 previous pair each",
+           ten, {e: {f"team:{i // 5}", f"home:{i // 2}"} for i, e in enumerate(ten)},
+           {(ten[i], ten[(i + 5) % 10]) for i in range(10)})
+    yield ("4 people, 1 household, 2 previous pairs",
+           four, {four[0]: {"home:a"}, four[1]: {"home:a"}},
+           {(four[2], four[3]), (four[3], four[2])})
+    yield ("6 people, households of 2, 1 previous pair each",
+           six, {e: {f"home:{i // 2}"} for i, e in enumerate(six)},
+           {(six[i], six[(i + 2) % 6]) for i in range(6)})
+
+
+def check_small(seeds=300):
+    """Every seed must find a pairing for small inputs that are known to have one."""
+    for label, emails, groups, forbidden in _small_cases():
+        start = time.perf_counter()
+        for seed in range(seeds):
+            _check(build_assignments(emails, seed=seed, groups=groups, forbidden_pairs=forbidden), groups, forbidden)
+        print(f"{label}: {seeds} seeds ok, {(time.perf_counter() - start) / seeds * 1000:.2f}ms each")
+
+
+if __name__ == '__main__':
+    check_small()
+    print()
+    print(f"{'participants':>12}  {'plain':>9}  {'with rules':>10}")
+    for n in SIZES:
+        print(f"{n:>12,}  {bench(n, False) * 1000:>7.1f}ms  {bench(n, True) * 1000:>8.1f}ms")
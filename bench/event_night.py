@@ -0,0 +1,239 @@
+"""Simulate a full event night and report what each rerun costs.
+
+Drives N players plus the admin through signup -> token_reveal -> gift_hunt ->
+star_voting -> grand_reveal with Streamlit's AppTest, against the SQLite
+backend with an injected per-call latency, and prints p50/p95 rerun latency,
+database calls per rerun and reruns per second for every stage.
+
+    python bench/event_night.py --users 100 --latency-ms 20 --workers 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, 'app.py')
+sys.path.insert(0, ROOT)
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import db  # noqa: E402
+from storage import SQLiteStorage  # noqa: E402
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.calls = 0
+        self.wall = 0.0
+
+    def report(self):
+        n = len(self.latencies)
+        ms = sorted(x * 1000 for x in self.latencies)
+        return {
+            'stage': self.name,
+            'reruns': n,
+            'p50_ms': round(statistics.median(ms), 1) if n else None,
+            'p95_ms': round(ms[min(n - 1, int(n * 0.95))], 1) if n else None,
+            'db_calls_per_rerun': round(self.calls / n, 2) if n else None,
+            'reruns_per_sec': round(n / self.wall, 1) if self.wall else None,
+        }
+
+
+class Player:
+    """One browser session, kept open for the whole night like a real tab."""
+
+    def __init__(self, index, email, name, secrets):
+        self.index = index
+        self.email = email
+        self.name = name
+        self.latencies = []
+        self.at = AppTest.from_file(APP, default_timeout=120)
+        for k, v in secrets.items():
+            self.at.secrets[k] = v
+
+    def rerun(self):
+        start = time.perf_counter()
+        self.at.run()
+        self.latencies.append(time.perf_counter() - start)
+        if self.at.exception:
+            raise RuntimeError(f"{self.email}: {self.at.exception[0].message}")
+
+    def button(self, text):
+        return next((b for b in self.at.button if text in b.label), None)
+
+    def text(self, label):
+        return next(t for t in self.at.text_input if t.label == label)
+
+    def login(self):
+        self.at.text_input(key='login_email').input(self.email)
+        self.at.text_input(key='login_pass').input('secret')
+        self.button('Log In').click()
+        self.rerun()
+
+    def section(self, name):
+        self.at.radio(key='section').set_value(name)
+        self.rerun()
+
+
+# --- PLAYER SCRIPTS, ONE PER STAGE ---
+
+def signup(player, names):
+    player.rerun()
+    player.text("Full Name").input(player.name)
+    player.at.text_input(key='signup_email').input(player.email)
+    player.text("Create Passphrase").input('secret')
+    for label in ["Answer for Clue 1", "Answer for Clue 2", "Answer for Clue 3",
+                  "Secret Enjoyment", "Wrong Assumption", "Weekend Hideout"]:
+        player.text(label).input(f"{player.name} {label}")
+    player.at.checkbox[0].check()
+    player.button('Join').click()
+    player.rerun()
+    player.login()
+
+
+def look(player, names):
+    player.rerun()
+
+
+def reveal(player, names):
+    # the Star Game section is where the winner is counted and announced
+    player.section("🌟 Star Game")
+
+
+def hunt(player, names):
+    player.section("🎁 My Gift")
+    player.button('RECEIVED').click()
+    player.rerun()
+    player.button('OPENED').click()
+    player.rerun()
+    santa = names[player.email]
+    guesses = [santa]
+    if player.index % 2:  # every other player burns a wrong guess first
+        guesses.insert(0, next(o for o in player.at.selectbox[0].options if o not in ("Select...", santa)))
+    for guess in guesses:
+        player.at.selectbox[0].select(guess)
+        player.button('Lock In').click()
+        player.rerun()
+
+
+def vote(player, names):
+    player.section("🌟 Star Game")
+    # Speed Winners watch from the VIP lounge instead, and a small event can
+    # leave a voter with nobody left to vote for
+    if player.at.selectbox and len(player.at.selectbox[0].options) > 1:
+        player.at.selectbox[0].select(player.at.selectbox[0].options[1])
+        player.rerun()
+        player.button('Vote').click()
+        player.rerun()
+
+
+STAGES = [('signup', signup), ('token_reveal', look), ('gift_hunt', hunt),
+          ('star_voting', vote), ('grand_reveal', reveal)]
+
+
+def worker(conn, indexes, secrets):
+    """Own a slice of the players in a separate process, like an app replica.
+
+    Streamlit's test runtime is a per-process singleton, so parallel sessions
+    need separate processes. Each stage command runs this slice's script and
+    reports the rerun latencies and the DB calls made by this process.
+    """
+    players = [Player(i, f"player{i}@example.com", f"Player {i}", secrets) for i in indexes]
+    store = db._create_sqlite_storage(secrets['SQLITE_PATH'], float(secrets['SQLITE_LATENCY_MS']))
+    script = dict(STAGES)
+    while True:
+        stage = conn.recv()
+        if stage is None:
+            return
+        calls_before = store.calls
+        names = {}
+        if stage == 'gift_hunt':
+            # answer key, read on a side connection so it is not counted
+            peek = SQLiteStorage(secrets['SQLITE_PATH'])
+            people = {p['email']: p['name'] for p in peek.page('participants', 'email, name', ('email',), limit=-1)}
+            names = {a['recipient_email']: people[a['santa_email']] for a in peek.page('assignments', '*', ('santa_email',), limit=-1)}
+        try:
+            for player in players:
+                script[stage](player, names)
+        except Exception:
+            # hand the failure to the parent instead of leaving it waiting
+            conn.send(traceback.format_exc())
+            return
+        latencies = [x for p in players for x in p.latencies]
+        for p in players:
+            p.latencies.clear()
+        conn.send((latencies, store.calls - calls_before))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--workers', type=int, default=1,
+                        help="parallel processes; each has its own caches like a separate app replica")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'event.db')
+    secrets = {'STORAGE_BACKEND': 'sqlite', 'SQLITE_PATH': path, 'SQLITE_LATENCY_MS': args.latency_ms}
+    SQLiteStorage(path).add_participant({'email': 'admin@example.com', 'name': 'Admin', 'passphrase': 'secret', 'is_admin': True})
+
+    ctx = multiprocessing.get_context('spawn')
+    pipes = []
+    for w in range(args.workers):
+        parent, child = ctx.Pipe()
+        ctx.Process(target=worker, args=(child, range(w, args.users, args.workers), secrets), daemon=True).start()
+        pipes.append(parent)
+
+    admin = Player(-1, 'admin@example.com', 'Admin', secrets)
+    results = []
+    for stage, _ in STAGES:
+        if stage == 'token_reveal':
+            admin.rerun()
+            admin.login()
+            admin.button('Generate').click()
+            admin.rerun()
+        elif stage != 'signup':
+            admin.at.selectbox[0].select(stage)
+            admin.button('Update Stage').click()
+            admin.rerun()
+        if stage != 'signup':
+            # players' change watchers pick the new stage up within one cache period
+            time.sleep(db.CACHE_TTL_SECONDS['versions'])
+
+        stats = StageStats(stage)
+        started = time.perf_counter()
+        for conn in pipes:
+            conn.send(stage)
+        for conn in pipes:
+            reply = conn.recv()
+            if isinstance(reply, str):
+                raise RuntimeError(f"worker failed in {stage}:\n{reply}")
+            latencies, calls = reply
+            stats.latencies += latencies
+            stats.calls += calls
+        stats.wall = time.perf_counter() - started
+        results.append(stats)
+
+    for conn in pipes:
+        conn.send(None)
+
+    report = [s.report() for s in results]
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{args.users} players, {args.latency_ms:g}ms per DB call, {args.workers} worker process(es)")
+    print(f"{'stage':<14}{'reruns':>8}{'p50 ms':>9}{'p95 ms':>9}{'calls/rerun':>13}{'reruns/s':>10}")
+    for r in report:
+        print(f"{r['stage']:<14}{r['reruns']:>8}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['db_calls_per_rerun']:>13}{r['reruns_per_sec']:>10}")
+
+
+if __name__ == '__main__':
+    main()
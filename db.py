@@ -0,0 +1,399 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+
+import httpx
+import streamlit as st
+from supabase import create_client, Client, ClientOptions
+
+from profiling import QueryProfiler, InstrumentedStorage
+from storage import SupabaseStorage, SQLiteStorage
+
+# --- CONNECTION POOL ---
+# Streamlit re-executes app.py on every click, but imported modules and
+# st.cache_resource objects live for the whole server process. Keeping the
+# client here means every rerun (and every session) shares one keep-alive
+# HTTP pool instead of paying a fresh TLS handshake per interaction.
+
+DEFAULT_POOL_SIZE = 20
+DEFAULT_KEEPALIVE_SECONDS = 60
+DEFAULT_TIMEOUT_SECONDS = 10
+
+
+class PoolStats:
+    """Process-wide counters for client and connection reuse."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.client_hits = 0
+        self.client_misses = 0
+        self.requests = 0
+        self.connections_opened = 0
+
+    def _bump(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _trace(self, event, info):
+        # httpcore only emits connect_tcp when the pool has no idle connection
+        if event == "connection.connect_tcp.complete":
+            self._bump('connections_opened')
+
+    def on_request(self, request):
+        self._bump('requests')
+        request.extensions['trace'] = self._trace
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'client_hits': self.client_hits,
+                'client_misses': self.client_misses,
+                'requests': self.requests,
+                'connection_hits': max(self.requests - self.connections_opened, 0),
+                'connection_misses': self.connections_opened,
+            }
+
+
+pool_stats = PoolStats()
+
+
+def _setting(name, default):
+    try:
+        return type(default)(st.secrets.get(name, default))
+    except (FileNotFoundError, ValueError, TypeError):
+        return default
+
+
+@st.cache_resource(show_spinner=False)
+def _create_pooled_client(url, key, pool_size, keepalive_seconds, timeout_seconds):
+    pool_stats._bump('client_misses')
+    http = httpx.Client(
+        http2=True,
+        follow_redirects=True,
+        timeout=timeout_seconds,
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=keepalive_seconds,
+        ),
+        event_hooks={'request': [pool_stats.on_request]},
+    )
+    return create_client(url, key, options=ClientOptions(httpx_client=http))
+
+
+def get_client() -> Client:
+    """Return the shared Supabase client, creating its pool on first use."""
+    before = pool_stats.client_misses
+    client = _create_pooled_client(
+        st.secrets["SUPABASE_URL"],
+        st.secrets["SUPABASE_KEY"],
+        _setting("SUPABASE_POOL_SIZE", DEFAULT_POOL_SIZE),
+        _setting("SUPABASE_KEEPALIVE_SECONDS", DEFAULT_KEEPALIVE_SECONDS),
+        _setting("SUPABASE_TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS),
+    )
+    if pool_stats.client_misses == before:
+        pool_stats._bump('client_hits')
+    return client
+
+
+# --- STORAGE BACKEND ---
+# STORAGE_BACKEND = "sqlite" in secrets swaps Supabase for a local database so
+# the app can be run, profiled and load-tested offline. SQLITE_PATH defaults to
+# a private in-memory database and SQLITE_LATENCY_MS imitates network delay.
+
+@st.cache_resource(show_spinner=False)
+def _create_sqlite_storage(path, latency_ms):
+    return SQLiteStorage(path, latency=latency_ms / 1000)
+
+
+def backend_name():
+    return _setting("STORAGE_BACKEND", "supabase")
+
+
+# Every storage call is timed into this process-wide profiler (Admin Cockpit)
+profiler = QueryProfiler()
+
+
+def get_storage() -> InstrumentedStorage:
+    if backend_name() == "sqlite":
+        store = _create_sqlite_storage(_setting("SQLITE_PATH", ":memory:"), _setting("SQLITE_LATENCY_MS", 0.0))
+    else:
+        store = SupabaseStorage(get_client())
+    return InstrumentedStorage(store, profiler)
+
+
+# Rows per insert, well under PostgREST's request body limit
+WRITE_CHUNK_SIZE = 500
+
+
+def chunked(rows, size):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+# --- PAGINATED SCANS ---
+# PostgREST silently caps a plain select at its max-rows setting, so every bulk
+# read walks the table in keyset order instead: each page asks for rows after
+# the last key seen, which stays fast at any depth (unlike OFFSET) and holds at
+# most one page in memory at a time.
+#
+# A page shorter than asked for is taken as the end of the table, so a page
+# must never be larger than the server's cap: set SUPABASE_MAX_ROWS to the
+# project's max-rows if it is below the Supabase default of 1000.
+
+PAGE_SIZE = 500
+DEFAULT_MAX_ROWS = 1000
+
+
+def scan(table, columns, key, eq=None, page_size=None):
+    """Yield every matching row of table, one keyset page at a time.
+
+    key is the unique column (or tuple of columns) to page on and must be part
+    of columns. eq is an optional {column: value} filter.
+    """
+    key = (key,) if isinstance(key, str) else tuple(key)
+    page_size = min(page_size or PAGE_SIZE, _setting("SUPABASE_MAX_ROWS", DEFAULT_MAX_ROWS))
+    store = get_storage()
+    last = None
+    while True:
+        rows = store.page(table, columns, key, eq=eq, after=last, limit=page_size)
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last = tuple(rows[-1][col] for col in key)
+
+
+# --- READ CACHE ---
+# Config, participants and assignments change a handful of times per event, so
+# table reads are shared process-wide for a short TTL. Every write the app makes
+# calls invalidate() for the tables it touched, which keeps this process exact;
+# the TTL only bounds staleness from writes made elsewhere (e.g. the dashboard).
+
+CACHE_TTL_SECONDS = {'config': 5, 'participants': 60, 'assignments': 10, 'votes': 10, 'tally': 10, 'leaderboard': 10, 'status': 5, 'progress': 5, 'versions': 2}
+CACHE_MAX_ENTRIES = 16
+
+
+def _cached(table):
+    return st.cache_data(ttl=CACHE_TTL_SECONDS[table], max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+
+
+# --- REQUEST SNAPSHOT ---
+# One dashboard rerun used to issue ~10 sequential queries. The snapshot pulls
+# the small tables it needs concurrently over the shared pool, so a rerun
+# costs a single round trip of latency and every section reads from memory.
+
+PUBLIC_PARTICIPANT_COLUMNS = 'email, name, is_admin, clue_1, clue_2, clue_3, star_q1, star_q2, star_q3'
+LEADERBOARD_SIZE = 5
+STAR_PAGE_SIZE = 10
+
+# Threads shared by every session's snapshot prefetches; a snapshot asks for at
+# most a handful of tables, so this lets a couple of reruns fetch at once
+SNAPSHOT_FETCH_WORKERS = 8
+
+_fetch_pool = ThreadPoolExecutor(max_workers=SNAPSHOT_FETCH_WORKERS, thread_name_prefix='snapshot')
+
+
+# config, participants and assignments also take a change version (see
+# fetch_versions): the version is part of the cache key, so a bump anywhere is
+# a cache miss everywhere without waiting for the TTL.
+
+@_cached('config')
+def fetch_config(version=None):
+    return {r['key']: r['value'] for r in scan('config', 'key, value', 'key')}
+
+
+@_cached('participants')
+def fetch_participants(version=None):
+    return list(scan('participants', PUBLIC_PARTICIPANT_COLUMNS, 'email'))
+
+
+@_cached('assignments')
+def fetch_assignments(version=None):
+    return list(scan('assignments', '*', 'santa_email'))
+
+
+@_cached('votes')
+def fetch_votes():
+    return list(scan('votes', 'voter_email, voted_for_email', 'voter_email'))
+
+
+@_cached('tally')
+def fetch_vote_tally():
+    # Ranked by the database from trigger-maintained counters, so every viewer
+    # of the grand reveal shares one small read instead of counting all votes
+    return get_storage().vote_tally(1)
+
+
+@_cached('leaderboard')
+def fetch_leaderboard():
+    # At most LEADERBOARD_SIZE rows, served by an index on correct guesses.
+    # Only a correct guess invalidates it; wrong guesses and status clicks do not.
+    return get_storage().leaderboard(LEADERBOARD_SIZE)
+
+
+def fetch_star_profiles(voter_email, after=None):
+    """One page of anonymous Star Game profiles in voter_email's own order.
+
+    The order is derived from the voter and profile ids, so a cursor names the
+    same page on every rerun. Pages belong to one voter, so the caller keeps
+    them in its session rather than the shared cache.
+    """
+    return get_storage().star_profiles(voter_email, LEADERBOARD_SIZE, after=after, limit=STAR_PAGE_SIZE)
+
+
+@_cached('status')
+def fetch_participant_status():
+    """One projected row per player: name, token, gift status and guess progress."""
+    return list(scan('participant_status', 'email, name, recipient_token, status, guess_count, is_correct_guess, has_voted', 'email'))
+
+
+@_cached('progress')
+def fetch_progress():
+    return get_storage().progress()
+
+
+@_cached('versions')
+def fetch_versions():
+    """Change counters per table, bumped by database triggers."""
+    return {r['name']: r['version'] for r in scan('state_versions', 'name, version', 'name')}
+
+
+_TABLE_READS = {
+    'config': fetch_config,
+    'participants': fetch_participants,
+    'assignments': fetch_assignments,
+    'votes': fetch_votes,
+    'tally': fetch_vote_tally,
+    'leaderboard': fetch_leaderboard,
+    'status': fetch_participant_status,
+    'progress': fetch_progress,
+}
+
+# Cached reads computed from other tables, dropped along with them
+_DERIVED_READS = {
+    'participants': ('status', 'progress'),
+    'assignments': ('status', 'progress'),
+    'votes': ('tally', 'status', 'progress'),
+}
+
+
+def invalidate(*tables):
+    """Drop cached reads for tables this process has just written to."""
+    for table in tables:
+        (fetch_versions if table == 'versions' else _TABLE_READS[table]).clear()
+        for derived in _DERIVED_READS.get(table, ()):
+            _TABLE_READS[derived].clear()
+
+
+class Snapshot:
+    """Read-only view of the game state for a single rerun.
+
+    Tables are fetched on first access, so a rerun only pays for the data the
+    visible section actually reads. load_snapshot() prefetches the common ones
+    concurrently.
+    """
+
+    def __init__(self, prefetched=None, versions=None):
+        self._tables = dict(prefetched or {})
+        self._versions = versions or {}
+
+    def _table(self, table):
+        if table not in self._tables:
+            self._tables[table] = _read(table, self._versions)
+        return self._tables[table]
+
+    @property
+    def config(self):
+        return self._table('config')
+
+    @property
+    def participants(self):
+        return self._table('participants')
+
+    @property
+    def assignments(self):
+        return self._table('assignments')
+
+    @property
+    def votes(self):
+        return self._table('votes')
+
+    @property
+    def leaderboard(self):
+        return self._table('leaderboard')
+
+    @property
+    def star(self):
+        """The Star Game winner's tally row, or None before any vote."""
+        tally = self._table('tally')
+        return tally[0] if tally else None
+
+    @property
+    def stage(self):
+        return self.config.get('stage')
+
+    @property
+    def top_5_speed_winners(self):
+        return [x['recipient_email'] for x in self.leaderboard]
+
+    @property
+    def winners_circle_closed(self):
+        return len(self.leaderboard) >= LEADERBOARD_SIZE
+
+    # Indexes are built once per snapshot so name lookups never rescan a table
+    @cached_property
+    def _by_email(self):
+        return {p['email']: p for p in self.participants}
+
+    @cached_property
+    def _by_santa(self):
+        return {a['santa_email']: a for a in self.assignments}
+
+    @cached_property
+    def _by_recipient(self):
+        return {a['recipient_email']: a for a in self.assignments}
+
+    @cached_property
+    def _by_voter(self):
+        return {v['voter_email']: v for v in self.votes}
+
+    def participant(self, email):
+        return self._by_email.get(email)
+
+    def name_of(self, email):
+        p = self._by_email.get(email)
+        return p['name'] if p else None
+
+    def players(self):
+        return [p for p in self.participants if not p['is_admin']]
+
+    def assignment_for_santa(self, email):
+        return self._by_santa.get(email)
+
+    def assignment_for_recipient(self, email):
+        return self._by_recipient.get(email)
+
+    def vote_by(self, email):
+        return self._by_voter.get(email)
+
+
+# A new draw is always published together with a stage change, so assignments
+# are keyed on the config version as well
+_VERSION_OF = {'config': 'config', 'participants': 'participants', 'assignments': 'config'}
+
+
+def _read(table, versions):
+    version = _VERSION_OF.get(table)
+    if version in versions:
+        return _TABLE_READS[table](versions[version])
+    return _TABLE_READS[table]()
+
+
+def load_snapshot(*tables, versions=None):
+    """Start a snapshot with the given tables fetched concurrently."""
+    get_storage()  # resolve secrets and the backend on the script thread first
+    versions = versions or {}
+    # run each fetch in a copy of this context so the profiler credits this rerun
+    futures = {table: _fetch_pool.submit(contextvars.copy_context().run, _read, table, versions) for table in tables}
+    return Snapshot({table: f.result() for table, f in futures.items()}, versions)
@@ -0,0 +1,177 @@
+"""Participant sign-up rules and bulk import.
+
+The Join form and the admin bulk import both validate through
+missing_fields(), so a row accepted from a file is exactly a row the form
+would have accepted. Imports write through a callback, not a storage object.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+# Column -> label, in the order the Join form asks for them
+REQUIRED_FIELDS = {
+    'email': "Email",
+    'name': "Name",
+    'passphrase': "Passphrase",
+    'clue_1': "Clue 1",
+    'clue_2': "Clue 2",
+    'clue_3': "Clue 3",
+    'star_q1': "Star Question 1",
+    'star_q2': "Star Question 2",
+    'star_q3': "Star Question 3",
+}
+# Assignment rule columns; blank means "no team" / "no household"
+OPTIONAL_FIELDS = ('team', 'household')
+
+_YES = {'1', 'true', 'yes', 'y', 'x'}
+
+
+def missing_fields(row, consent, consent_label="Consent Checkbox"):
+    """Labels of the required answers row lacks, plus consent_label without consent."""
+    missing = [label for col, label in REQUIRED_FIELDS.items() if not row.get(col)]
+    if not consent:
+        missing.append(consent_label)
+    return missing
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.errors = []
+
+    def error(self, line, email, message):
+        self.errors.append({'line': line, 'email': email or '', 'error': message})
+
+
+def _decode_lines(file, bad_lines):
+    """Decode an uploaded file one line at a time, UTF-8 with an optional BOM.
+
+    A line that is not valid UTF-8 is decoded with replacement characters
+    and its 1-based number is added to bad_lines, so only the records on that
+    line are lost.
+    """
+    for line, raw in enumerate(file, start=1):
+        try:
+            text = raw.decode('utf-8-sig' if line == 1 else 'utf-8')
+        except UnicodeDecodeError:
+            bad_lines.add(line)
+            text = raw.decode('utf-8', errors='replace')
+        yield text
+
+
+def read_records(file, filename):
+    """Yield (line, record) from an uploaded CSV, JSON Lines or JSON array file.
+
+    CSV and JSON Lines are decoded and parsed a line at a time; a line that
+    cannot be decoded or parsed yields the exception in place of its record.
+    A .json file must hold one array and is parsed whole; line is then the
+    1-based position in it.
+    """
+    if filename.lower().endswith('.json'):
+        records = json.load(io.TextIOWrapper(file, encoding='utf-8-sig'))
+        if not isinstance(records, list):
+            raise ValueError("A .json upload must contain a list of participants.")
+        yield from enumerate(records, start=1)
+        return
+
+    bad_lines = set()
+    lines = _decode_lines(file, bad_lines)
+    if filename.lower().endswith(('.jsonl', '.ndjson')):
+        for line, text in enumerate(lines, start=1):
+            if line in bad_lines:
+                yield line, ValueError("not valid UTF-8")
+            elif text.strip():
+                try:
+                    yield line, json.loads(text)
+                except json.JSONDecodeError as e:
+                    yield line, e
+    else:
+        reader = csv.DictReader(lines)
+        first = 2
+        for record in reader:
+            # a quoted field can span lines, so a record covers first..line_num
+            if bad_lines.intersection(range(first, reader.line_num + 1)):
+                yield reader.line_num, ValueError("not valid UTF-8")
+            else:
+                yield reader.line_num, record
+            first = reader.line_num + 1
+
+
+def _clean(value):
+    return value.strip() if isinstance(value, str) else value
+
+
+def _consented(value):
+    return value is True or str(value).strip().lower() in _YES
+
+
+def valid_rows(records, report, protected=()):
+    """Yield participant rows that pass the Join checks, recording the rest.
+
+    Emails are normalised like the Join form; a repeated email keeps its first
+    row and reports the others. Emails in protected (admins) are never touched.
+    """
+    seen = {}
+    for line, record in records:
+        if isinstance(record, Exception):
+            report.error(line, None, f"unreadable: {record}")
+            continue
+        if not isinstance(record, dict):
+            report.error(line, None, "not a participant record")
+            continue
+        record = {str(k).strip().lower(): _clean(v) for k, v in record.items() if k is not None}
+        email = str(record.get('email') or '').lower()
+        record['email'] = email
+        missing = missing_fields(record, _consented(record.get('consent')), consent_label="consent")
+        if missing:
+            report.error(line, email, f"missing {', '.join(missing)}")
+            continue
+        if email in protected:
+            report.error(line, email, "is an admin account")
+            continue
+        if email in seen:
+            report.error(line, email, f"duplicate of line {seen[email]}")
+            continue
+        seen[email] = line
+        row = {col: str(record[col]) for col in REQUIRED_FIELDS}
+        for col in OPTIONAL_FIELDS:
+            row[col] = str(record[col]) if record.get(col) not in (None, '') else None
+        yield line, row
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def import_participants(records, upsert, chunk_size=500, protected=()):
+    """Validate records and upsert them in chunks with upsert(rows).
+
+    A failed chunk is retried row by row so one bad row only costs itself, and
+    an unreadable line is reported and skipped. Only a file that cannot be
+    read at all (a broken .json array, malformed CSV quoting) ends the import
+    early; rows before that point stay imported and the failure is reported.
+    Returns an ImportReport with the imported count and per-line errors.
+    """
+    report = ImportReport()
+    rows = valid_rows(records, report, protected)
+    try:
+        for batch in _batches(rows, chunk_size):
+            try:
+                upsert([row for _, row in batch])
+                report.imported += len(batch)
+            except Exception:
+                for line, row in batch:
+                    try:
+                        upsert([row])
+                        report.imported += 1
+                    except Exception as e:
+                        report.error(line, row['email'], str(e))
+    except (ValueError, csv.Error) as e:
+        # Undecodable or malformed input stops the read; the batches before
+        # it are already written, so report where it stopped instead of failing
+        report.error(None, None, f"stopped reading the file here: {e}")
+    report.errors.sort(key=lambda e: float('inf') if e['line'] is None else e['line'])
+    return report
@@ -0,0 +1,165 @@
+"""Per-rerun database call profiling for the Admin Cockpit.
+
+InstrumentedStorage wraps a Storage and reports every call to a process-wide
+QueryProfiler, which keeps running aggregates (by query, stage and session)
+plus a bounded log of the most recent calls for offline analysis.
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+
+# Which table each Storage method touches; page() names its own table
+_TABLE_OF = {
+    'leaderboard': 'assignments',
+    'vote_tally': 'vote_counts',
+    'progress': 'participant_status',
+    'login': 'participants',
+    'set_config': 'config',
+    'add_participant': 'participants',
+    'upsert_participants': 'participants',
+    'save_santa_clue': 'assignments',
+    'set_gift_status': 'assignments',
+    'lock_in_guess': 'assignments',
+    'star_profiles': 'participants',
+    'vote_for_profile': 'votes',
+    'begin_assignment_run': 'assignment_runs',
+    'stage_assignments': 'assignments_staging',
+    'publish_assignment_run': 'assignment_runs',
+    'abort_assignment_run': 'assignment_runs',
+}
+
+# The session and stage of the rerun making the call. Threads that fetch on
+# the script's behalf must run inside a copy of the script thread's context.
+_scope = contextvars.ContextVar('profile_scope', default=None)
+
+
+def _row_count(result):
+    if isinstance(result, list):
+        return len(result)
+    return 0 if result is None else 1
+
+
+class QueryProfiler:
+    # Sessions with no rerun or poll for this long are dropped from the report
+    SESSION_IDLE_SECONDS = 15 * 60
+
+    def __init__(self, recent=1000):
+        self._lock = threading.Lock()
+        self._recent_size = recent
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.queries = {}
+            self.stages = {}
+            self.sessions = {}
+            self.rerun_calls = 0
+            self.poll_calls = 0
+            self.recent = deque(maxlen=self._recent_size)
+
+    def _begin(self, session, kind, user=None):
+        now = time.time()
+        with self._lock:
+            for sid in [sid for sid, v in self.sessions.items() if now - v['last_seen'] > self.SESSION_IDLE_SECONDS]:
+                del self.sessions[sid]
+            s = self.sessions.setdefault(session, {'user': None, 'stage': None, 'reruns': 0, 'calls': 0, 'ms': 0.0,
+                                                   'polls': 0, 'poll_calls': 0, 'last_seen': now})
+            s[kind] += 1
+            s['last_seen'] = now
+            if user:
+                s['user'] = user
+            _scope.set({'session': session, 'stage': s['stage'], 'poll': kind == 'polls'})
+
+    def begin_rerun(self, session, user=None):
+        """Mark the start of a script rerun for session.
+
+        Calls made before set_stage() are credited to the stage the session
+        saw on its previous rerun.
+        """
+        self._begin(session, 'reruns', user)
+
+    def begin_poll(self, session):
+        """Mark the start of a timed fragment run (the change check) for session.
+
+        Its calls are counted apart from rerun calls, so an idle tab polling
+        in the background does not inflate calls per rerun.
+        """
+        self._begin(session, 'polls')
+
+    def set_stage(self, stage):
+        scope = _scope.get()
+        if scope is not None:
+            scope['stage'] = stage
+            with self._lock:
+                if scope['session'] in self.sessions:
+                    self.sessions[scope['session']]['stage'] = stage
+
+    def record(self, table, op, rows, seconds):
+        scope = _scope.get() or {'session': None, 'stage': None, 'poll': False}
+        ms = seconds * 1000
+        with self._lock:
+            q = self.queries.setdefault((table, op), {'calls': 0, 'rows': 0, 'ms': 0.0, 'max_ms': 0.0})
+            q['calls'] += 1
+            q['rows'] += rows
+            q['ms'] += ms
+            q['max_ms'] = max(q['max_ms'], ms)
+            by_stage = self.stages.setdefault(scope['stage'], {'calls': 0, 'ms': 0.0})
+            by_stage['calls'] += 1
+            by_stage['ms'] += ms
+            if scope['poll']:
+                self.poll_calls += 1
+            elif scope['session'] is not None:
+                self.rerun_calls += 1
+            if scope['session'] in self.sessions:
+                s = self.sessions[scope['session']]
+                s['poll_calls' if scope['poll'] else 'calls'] += 1
+                s['ms'] += ms
+            self.recent.append({'at': time.time(), 'session': scope['session'], 'stage': scope['stage'],
+                                'poll': scope['poll'], 'table': table, 'op': op, 'rows': rows, 'ms': round(ms, 2)})
+
+    def report(self):
+        with self._lock:
+            reruns = sum(s['reruns'] for s in self.sessions.values())
+            return {
+                'since': self.started,
+                'reruns': reruns,
+                'calls': sum(q['calls'] for q in self.queries.values()),
+                'poll_calls': self.poll_calls,
+                'calls_per_rerun': round(self.rerun_calls / reruns, 2) if reruns else None,
+                'hottest_queries': sorted(
+                    ({'table': t, 'op': op, **q, 'ms': round(q['ms'], 1), 'max_ms': round(q['max_ms'], 1)}
+                     for (t, op), q in self.queries.items()),
+                    key=lambda q: q['ms'], reverse=True),
+                'by_stage': [{'stage': stage or 'unknown', **v, 'ms': round(v['ms'], 1)} for stage, v in self.stages.items()],
+                'by_session': [
+                    {'session': sid, **v, 'ms': round(v['ms'], 1),
+                     'calls_per_rerun': round(v['calls'] / v['reruns'], 2) if v['reruns'] else None}
+                    for sid, v in self.sessions.items()],
+                'recent': list(self.recent),
+            }
+
+
+class InstrumentedStorage:
+    """Storage proxy that times every public method call."""
+
+    def __init__(self, inner, profiler):
+        self._inner = inner
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        attr = getattr(self._inner, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        def timed(*args, **kwargs):
+            table = args[0] if name == 'page' else _TABLE_OF.get(name, '?')
+            start = time.perf_counter()
+            result = None
+            try:
+                result = attr(*args, **kwargs)
+                return result
+            finally:
+                self._profiler.record(table, name, _row_count(result), time.perf_counter() - start)
+        return timed
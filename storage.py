@@ -0,0 +1,517 @@
+"""Storage backends for the Secret Santa app.
+
+Every read and write the app makes goes through a Storage object, so the game
+can run against Supabase in production or against a local SQLite database for
+offline runs, profiling and load tests. Neither class imports Streamlit; db.py
+picks one from the app's secrets.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+class Storage(ABC):
+    """Repository interface over config, participants, assignments and votes."""
+
+    # --- reads ---
+    @abstractmethod
+    def page(self, table, columns, key, eq=None, after=None, limit=500):
+        """Up to limit rows ordered by the key columns, strictly after the key tuple after."""
+
+    @abstractmethod
+    def leaderboard(self, limit):
+        """The first limit correct guesses, fastest first."""
+
+    @abstractmethod
+    def vote_tally(self, limit):
+        """The limit most-voted candidates with their vote counts, winner first.
+
+        Ties go to whoever reached the tied count first, then to email order.
+        """
+
+    @abstractmethod
+    def progress(self):
+        """Event-wide counters: participants, received, opened, guessed, voted."""
+
+    @abstractmethod
+    def login(self, email, passphrase):
+        ...
+
+    # --- writes ---
+    @abstractmethod
+    def set_config(self, key, value):
+        ...
+
+    @abstractmethod
+    def add_participant(self, row):
+        ...
+
+    @abstractmethod
+    def upsert_participants(self, rows):
+        """Insert rows in one batch, updating any whose email already exists."""
+
+    @abstractmethod
+    def save_santa_clue(self, santa_email, clue):
+        ...
+
+    @abstractmethod
+    def set_gift_status(self, recipient_email, status):
+        ...
+
+    @abstractmethod
+    def lock_in_guess(self, recipient_email, guess_email):
+        """Atomically record a guess; returns the updated assignment or None if rejected."""
+
+    # --- star game ---
+    @abstractmethod
+    def star_profiles(self, voter_email, skip_winners, after=None, limit=10):
+        """A page of votable profiles (profile_id, star_q1..3, sort_key) for voter_email.
+
+        Excludes admins, the voter and the first skip_winners Speed Winners.
+        Rows come in an order shuffled per voter but stable across calls;
+        pass the last row's sort_key as after to get the next page.
+        """
+
+    @abstractmethod
+    def vote_for_profile(self, voter_email, profile_id, skip_winners):
+        """Cast voter_email's vote for the owner of profile_id; False if it did not count.
+
+        Neither the voter nor the candidate may be among the first skip_winners
+        Speed Winners at the time of the vote.
+        """
+
+    # --- assignment runs ---
+    @abstractmethod
+    def begin_assignment_run(self):
+        """Open a run and return its id, or None while another run is open."""
+
+    @abstractmethod
+    def stage_assignments(self, run_id, rows):
+        ...
+
+    @abstractmethod
+    def publish_assignment_run(self, run_id):
+        ...
+
+    @abstractmethod
+    def abort_assignment_run(self, run_id):
+        ...
+
+
+# --- SUPABASE ---
+
+def _quote(value):
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _after(key, last):
+    # (a, b) > (x, y)  ==  a > x or (a = x and b > y)
+    terms = []
+    for i, col in enumerate(key):
+        eqs = [f"{k}.eq.{_quote(v)}" for k, v in zip(key[:i], last[:i])]
+        term = f"{col}.gt.{_quote(last[i])}"
+        terms.append(f"and({','.join(eqs + [term])})" if eqs else term)
+    return ','.join(terms)
+
+
+class SupabaseStorage(Storage):
+    """PostgREST tables plus the RPCs in supabase/migrations."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def page(self, table, columns, key, eq=None, after=None, limit=500):
+        query = self.client.table(table).select(columns)
+        for col, value in (eq or {}).items():
+            query = query.eq(col, value)
+        if after is not None:
+            query = query.gt(key[0], after[0]) if len(key) == 1 else query.or_(_after(key, after))
+        for col in key:
+            query = query.order(col)
+        return query.limit(limit).execute().data
+
+    def leaderboard(self, limit):
+        # Filter, sort and limit happen in Postgres against the partial index on
+        # correct guesses, so this returns at most limit rows
+        return (self.client.table('assignments')
+                .select('recipient_email, guess_timestamp')
+                .eq('is_correct_guess', True)
+                .not_.is_('guess_timestamp', 'null')
+                .order('guess_timestamp')
+                .order('guess_seq')
+                .limit(limit)
+                .execute().data)
+
+    def vote_tally(self, limit):
+        # Counters are kept by a trigger on votes (see vote_counts.sql)
+        return (self.client.table('vote_counts')
+                .select('voted_for_email, votes')
+                .order('votes', desc=True)
+                .order('last_vote_seq')
+                .order('voted_for_email')
+                .limit(limit)
+                .execute().data)
+
+    def progress(self):
+        # One row of counters computed over participant_status in Postgres
+        # (see participant_status.sql)
+        return self.client.rpc('participant_progress', {}).execute().data[0]
+
+    def login(self, email, passphrase):
+        res = self.client.table('participants').select('*').eq('email', email).eq('passphrase', passphrase).execute()
+        return res.data[0] if res.data else None
+
+    def set_config(self, key, value):
+        self.client.table('config').update({'value': value}).eq('key', key).execute()
+
+    def add_participant(self, row):
+        self.client.table('participants').insert(row).execute()
+
+    def upsert_participants(self, rows):
+        self.client.table('participants').upsert(rows, on_conflict='email').execute()
+
+    def save_santa_clue(self, santa_email, clue):
+        self.client.table('assignments').update({'santa_clue_1': clue}).eq('santa_email', santa_email).execute()
+
+    def set_gift_status(self, recipient_email, status):
+        self.client.table('assignments').update({'status': status}).eq('recipient_email', recipient_email).execute()
+
+    def lock_in_guess(self, recipient_email, guess_email):
+        # Validation, counting and the timestamp all happen in one conditional
+        # UPDATE on the server (see lock_in_guess.sql)
+        rows = self.client.rpc('lock_in_guess', {
+            'p_recipient_email': recipient_email, 'p_guess_email': guess_email
+        }).execute().data
+        return rows[0] if rows else None
+
+    def star_profiles(self, voter_email, skip_winners, after=None, limit=10):
+        # Filtering, the per-voter shuffle and paging run in Postgres
+        # (see star_profiles.sql); emails never leave the database
+        return self.client.rpc('star_profiles_page', {
+            'p_voter_email': voter_email, 'p_skip_winners': skip_winners, 'p_after': after, 'p_limit': limit
+        }).execute().data
+
+    def vote_for_profile(self, voter_email, profile_id, skip_winners):
+        return bool(self.client.rpc('vote_for_profile', {
+            'p_voter_email': voter_email, 'p_profile_id': profile_id, 'p_skip_winners': skip_winners
+        }).execute().data)
+
+    def begin_assignment_run(self):
+        return self.client.rpc('begin_assignment_run', {}).execute().data
+
+    def stage_assignments(self, run_id, rows):
+        self.client.table('assignments_staging').insert([dict(row, run_id=run_id) for row in rows]).execute()
+
+    def publish_assignment_run(self, run_id):
+        return self.client.rpc('publish_assignment_run', {'p_run_id': run_id}).execute().data
+
+    def abort_assignment_run(self, run_id):
+        self.client.rpc('abort_assignment_run', {'p_run_id': run_id}).execute()
+
+
+# --- SQLITE ---
+# Mirrors the Supabase schema and RPCs closely enough to play a whole event.
+# One connection is shared by every session behind a lock, which also makes
+# each method a single transaction like the Postgres functions it stands in for.
+
+SQLITE_SCHEMA = """
+create table if not exists config (
+    key text primary key,
+    value text
+);
+create table if not exists participants (
+    email text primary key,
+    name text not null,
+    passphrase text not null,
+    is_admin boolean not null default 0,
+    clue_1 text, clue_2 text, clue_3 text,
+    star_q1 text, star_q2 text, star_q3 text,
+    team text,
+    household text,
+    profile_id text not null unique default (lower(hex(randomblob(16))))
+);
+create table if not exists assignments (
+    id integer primary key autoincrement,
+    santa_email text not null unique,
+    recipient_email text not null unique,
+    recipient_token text not null,
+    status text not null default 'assigned',
+    santa_clue_1 text,
+    guess_count integer not null default 0,
+    guess_timestamp text,
+    guess_seq integer,
+    is_correct_guess boolean not null default 0,
+    guess_email text,
+    first_wrong_guess text
+);
+create index if not exists assignments_speed_leaderboard_idx
+    on assignments (guess_timestamp, guess_seq) where is_correct_guess;
+create table if not exists votes (
+    id integer primary key autoincrement,
+    voter_email text not null unique,
+    voted_for_email text not null
+);
+create table if not exists vote_counts (
+    voted_for_email text primary key,
+    votes integer not null default 0,
+    last_vote_seq integer not null
+);
+create index if not exists vote_counts_ranking_idx
+    on vote_counts (votes desc, last_vote_seq, voted_for_email);
+create trigger if not exists votes_count_insert after insert on votes
+    begin
+        insert into vote_counts (voted_for_email, votes, last_vote_seq) values (new.voted_for_email, 1, new.id)
+            on conflict (voted_for_email) do update set votes = votes + 1, last_vote_seq = excluded.last_vote_seq;
+    end;
+create trigger if not exists votes_count_delete after delete on votes
+    begin
+        update vote_counts set votes = votes - 1 where voted_for_email = old.voted_for_email;
+        delete from vote_counts where voted_for_email = old.voted_for_email and votes <= 0;
+    end;
+create table if not exists previous_pairs (
+    santa_email text not null,
+    recipient_email text not null,
+    primary key (santa_email, recipient_email)
+);
+create table if not exists assignment_runs (
+    id integer primary key autoincrement,
+    started_at text not null default (datetime('now')),
+    finished_at text
+);
+create table if not exists assignments_staging (
+    run_id integer not null,
+    santa_email text not null,
+    recipient_email text not null,
+    recipient_token text not null
+);
+create table if not exists state_versions (
+    name text primary key,
+    version integer not null default 0
+);
+create view if not exists participant_status as
+    select p.email, p.name, a.recipient_token, a.status,
+           coalesce(a.guess_count, 0) as guess_count,
+           coalesce(a.is_correct_guess, 0) as is_correct_guess,
+           v.voter_email is not null as has_voted
+      from participants p
+      left join assignments a on a.recipient_email = p.email
+      left join votes v on v.voter_email = p.email
+     where not p.is_admin;
+insert or ignore into config (key, value) values ('stage', 'signup');
+insert or ignore into state_versions (name) values ('config'), ('participants');
+create trigger if not exists config_bump_version after update on config
+    begin update state_versions set version = version + 1 where name = 'config'; end;
+create trigger if not exists participants_bump_version after insert on participants
+    begin update state_versions set version = version + 1 where name = 'participants'; end;
+create trigger if not exists participants_update_bump_version after update on participants
+    begin update state_versions set version = version + 1 where name = 'participants'; end;
+"""
+
+# The first n correct guessers, as a subquery with one parameter (n)
+_SPEED_WINNERS = ('(select recipient_email from assignments'
+                  ' where is_correct_guess and guess_timestamp is not null'
+                  ' order by guess_timestamp, guess_seq limit ?)')
+
+# SQLite has no boolean type; these columns are converted back on read
+_BOOLEAN_COLUMNS = {'is_admin', 'is_correct_guess', 'has_voted'}
+
+
+def _columns(columns):
+    return '*' if columns.strip() == '*' else ', '.join(f'"{c.strip()}"' for c in columns.split(','))
+
+
+class SQLiteStorage(Storage):
+    """In-process stand-in for Supabase, with optional per-call latency.
+
+    path defaults to a private in-memory database. latency (seconds) is slept
+    before every call to imitate a network round trip. calls counts every
+    round trip made so far.
+    """
+
+    def __init__(self, path=':memory:', latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.create_function('md5', 1, lambda s: hashlib.md5(s.encode()).hexdigest(), deterministic=True)
+        self.conn.executescript(SQLITE_SCHEMA)
+
+    @contextmanager
+    def _tx(self):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            self.conn.execute('begin immediate')
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute('rollback')
+                raise
+            self.conn.execute('commit')
+
+    @staticmethod
+    def _row(row):
+        if row is None:
+            return None
+        out = dict(row)
+        for col in _BOOLEAN_COLUMNS & out.keys():
+            out[col] = bool(out[col])
+        return out
+
+    def page(self, table, columns, key, eq=None, after=None, limit=500):
+        where, params = [], []
+        for col, value in (eq or {}).items():
+            where.append(f'"{col}" = ?')
+            params.append(value)
+        if after is not None:
+            where.append(f"({', '.join(key)}) > ({', '.join('?' * len(key))})")
+            params.extend(after)
+        sql = f'select {_columns(columns)} from "{table}"'
+        if where:
+            sql += ' where ' + ' and '.join(where)
+        sql += f" order by {', '.join(key)} limit ?"
+        with self._tx() as conn:
+            return [self._row(r) for r in conn.execute(sql, params + [limit])]
+
+    def leaderboard(self, limit):
+        with self._tx() as conn:
+            return [self._row(r) for r in conn.execute(
+                'select recipient_email, guess_timestamp from assignments'
+                ' where is_correct_guess and guess_timestamp is not null'
+                ' order by guess_timestamp, guess_seq limit ?', (limit,))]
+
+    def vote_tally(self, limit):
+        with self._tx() as conn:
+            return [self._row(r) for r in conn.execute(
+                'select voted_for_email, votes from vote_counts'
+                ' order by votes desc, last_vote_seq, voted_for_email limit ?', (limit,))]
+
+    def progress(self):
+        with self._tx() as conn:
+            return dict(conn.execute(
+                'select count(*) as participants,'
+                " coalesce(sum(status in ('received', 'opened', 'revealed')), 0) as received,"
+                " coalesce(sum(status in ('opened', 'revealed')), 0) as opened,"
+                ' coalesce(sum(is_correct_guess), 0) as guessed,'
+                ' coalesce(sum(has_voted), 0) as voted'
+                ' from participant_status').fetchone())
+
+    def login(self, email, passphrase):
+        with self._tx() as conn:
+            return self._row(conn.execute(
+                'select * from participants where email = ? and passphrase = ?', (email, passphrase)).fetchone())
+
+    def set_config(self, key, value):
+        with self._tx() as conn:
+            conn.execute('update config set value = ? where key = ?', (value, key))
+
+    def add_participant(self, row):
+        cols = ', '.join(f'"{c}"' for c in row)
+        with self._tx() as conn:
+            conn.execute(f"insert into participants ({cols}) values ({', '.join('?' * len(row))})", list(row.values()))
+
+    def upsert_participants(self, rows):
+        cols = list(rows[0])
+        updates = ', '.join(f'"{c}" = excluded."{c}"' for c in cols if c != 'email')
+        with self._tx() as conn:
+            conn.executemany(
+                f"insert into participants ({_columns(', '.join(cols))})"
+                f" values ({', '.join('?' * len(cols))}) on conflict (email) do update set {updates}",
+                [[row[c] for c in cols] for row in rows])
+
+    def save_santa_clue(self, santa_email, clue):
+        with self._tx() as conn:
+            conn.execute('update assignments set santa_clue_1 = ? where santa_email = ?', (clue, santa_email))
+
+    def set_gift_status(self, recipient_email, status):
+        with self._tx() as conn:
+            conn.execute('update assignments set status = ? where recipient_email = ?', (status, recipient_email))
+
+    def lock_in_guess(self, recipient_email, guess_email):
+        # The tiebreak is taken inside the write transaction, so every
+        # connection to the same file shares one increasing sequence
+        with self._tx() as conn:
+            row = conn.execute("""
+                update assignments
+                   set guess_count = guess_count + 1,
+                       guess_timestamp = :now,
+                       guess_seq = (select coalesce(max(guess_seq), 0) + 1 from assignments),
+                       is_correct_guess = (:guess = santa_email),
+                       guess_email = case when :guess = santa_email then :guess else guess_email end,
+                       first_wrong_guess = case
+                           when :guess <> santa_email and guess_count = 0 then :guess
+                           else first_wrong_guess
+                       end
+                 where recipient_email = :recipient
+                   and status in ('opened', 'revealed')
+                   and guess_count < 2
+                   and not is_correct_guess
+                   and :guess <> :recipient
+                   and :guess is not first_wrong_guess
+                returning *
+            """, {'now': datetime.now(timezone.utc).isoformat(),
+                  'guess': guess_email, 'recipient': recipient_email}).fetchone()
+            return self._row(row)
+
+    def star_profiles(self, voter_email, skip_winners, after=None, limit=10):
+        with self._tx() as conn:
+            return [self._row(r) for r in conn.execute(
+                "select * from (select profile_id, star_q1, star_q2, star_q3,"
+                " md5(? || ':' || profile_id) as sort_key"
+                ' from participants where not is_admin and email <> ?'
+                f' and email not in {_SPEED_WINNERS})'
+                ' where ? is null or sort_key > ? order by sort_key limit ?',
+                (voter_email, voter_email, skip_winners, after, after, limit))]
+
+    def vote_for_profile(self, voter_email, profile_id, skip_winners):
+        with self._tx() as conn:
+            return conn.execute(
+                'insert into votes (voter_email, voted_for_email)'
+                ' select ?, email from participants where profile_id = ? and email <> ?'
+                f' and email not in {_SPEED_WINNERS} and ? not in {_SPEED_WINNERS}'
+                ' on conflict do nothing',
+                (voter_email, profile_id, voter_email, skip_winners, voter_email, skip_winners)).rowcount > 0
+
+    def begin_assignment_run(self):
+        with self._tx() as conn:
+            # a run left open by a crashed worker stops blocking after 10 minutes
+            conn.execute("update assignment_runs set finished_at = datetime('now')"
+                         " where finished_at is null and started_at < datetime('now', '-10 minutes')")
+            conn.execute('delete from assignments_staging where run_id in'
+                         ' (select id from assignment_runs where finished_at is not null)')
+            if conn.execute('select 1 from assignment_runs where finished_at is null').fetchone():
+                return None
+            return conn.execute('insert into assignment_runs default values').lastrowid
+
+    def stage_assignments(self, run_id, rows):
+        with self._tx() as conn:
+            conn.executemany(
+                'insert into assignments_staging (run_id, santa_email, recipient_email, recipient_token)'
+                ' values (?, ?, ?, ?)',
+                [(run_id, r['santa_email'], r['recipient_email'], r['recipient_token']) for r in rows])
+
+    def publish_assignment_run(self, run_id):
+        with self._tx() as conn:
+            if not conn.execute('select 1 from assignment_runs where id = ? and finished_at is null', (run_id,)).fetchone():
+                raise RuntimeError(f"assignment run {run_id} is not open")
+            conn.execute('delete from votes')
+            conn.execute('delete from assignments')
+            count = conn.execute(
+                'insert into assignments (santa_email, recipient_email, recipient_token)'
+                ' select santa_email, recipient_email, recipient_token from assignments_staging where run_id = ?',
+                (run_id,)).rowcount
+            conn.execute('delete from assignments_staging where run_id = ?', (run_id,))
+            conn.execute("update assignment_runs set finished_at = datetime('now') where id = ?", (run_id,))
+            conn.execute("update config set value = 'token_reveal' where key = 'stage'")
+            return count
+
+    def abort_assignment_run(self, run_id):
+        with self._tx() as conn:
+            conn.execute('delete from assignments_staging where run_id = ?', (run_id,))
+            conn.execute("update assignment_runs set finished_at = datetime('now') where id = ?", (run_id,))
@@ -0,0 +1,8 @@
+-- Speed Winners leaderboard.
+-- db.fetch_leaderboard() asks PostgREST for the first 5 correct guesses ordered
+-- by guess_timestamp. This partial index holds only correct guesses, already in
+-- that order, so the read is a short index scan instead of a full table sort.
+
+create index if not exists assignments_speed_leaderboard_idx
+    on assignments (guess_timestamp)
+    where is_correct_guess and guess_timestamp is not null;
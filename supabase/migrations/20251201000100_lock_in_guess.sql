@@ -0,0 +1,39 @@
+-- Fastest Finger guesses.
+-- lock_in_guess() validates, counts and timestamps a guess in a single UPDATE,
+-- so the row lock serialises concurrent clicks for the same recipient: a double
+-- click cannot get past the 2-guess limit or overwrite a correct guess. The
+-- timestamp comes from the database clock, and guess_seq gives a strictly
+-- increasing tiebreak for guesses that land in the same microsecond.
+
+create sequence if not exists guess_seq;
+
+alter table assignments add column if not exists guess_seq bigint;
+
+create or replace function lock_in_guess(p_recipient_email text, p_guess_email text)
+returns setof assignments
+language sql
+as $$
+    update assignments
+       set guess_count = coalesce(guess_count, 0) + 1,
+           guess_timestamp = clock_timestamp(),
+           guess_seq = nextval('guess_seq'),
+           is_correct_guess = (p_guess_email = santa_email),
+           guess_email = case when p_guess_email = santa_email then p_guess_email else guess_email end,
+           first_wrong_guess = case
+               when p_guess_email <> santa_email and coalesce(guess_count, 0) = 0 then p_guess_email
+               else first_wrong_guess
+           end
+     where recipient_email = p_recipient_email
+       and status in ('opened', 'revealed')
+       and coalesce(guess_count, 0) < 2
+       and not coalesce(is_correct_guess, false)
+       and p_guess_email <> p_recipient_email
+       and p_guess_email is distinct from first_wrong_guess
+    returning *;
+$$;
+
+drop index if exists assignments_speed_leaderboard_idx;
+
+create index if not exists assignments_speed_leaderboard_idx
+    on assignments (guess_timestamp, guess_seq)
+    where is_correct_guess and guess_timestamp is not null;
@@ -0,0 +1,12 @@
+-- Exclusion rules for run_assignment().
+-- Participants who share a non-null team or household never draw each other,
+-- and nobody draws the same recipient as in any pair listed in previous_pairs.
+
+alter table participants add column if not exists team text;
+alter table participants add column if not exists household text;
+
+create table if not exists previous_pairs (
+    santa_email text not null,
+    recipient_email text not null,
+    primary key (santa_email, recipient_email)
+);
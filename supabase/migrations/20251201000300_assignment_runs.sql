@@ -0,0 +1,82 @@
+-- Assignment regeneration without an empty-table window.
+-- run_assignment() opens a run (only one may be open at a time), streams the new
+-- pairs into assignments_staging in chunks, then publish_assignment_run() swaps
+-- them in with a single transaction. Readers keep seeing the old assignments
+-- until the commit, and never an empty table.
+
+create table if not exists assignment_runs (
+    id bigint generated always as identity primary key,
+    started_at timestamptz not null default now(),
+    finished_at timestamptz
+);
+
+create unique index if not exists assignment_runs_one_open_idx
+    on assignment_runs ((true))
+    where finished_at is null;
+
+create table if not exists assignments_staging (
+    run_id bigint not null references assignment_runs (id) on delete cascade,
+    santa_email text not null,
+    recipient_email text not null,
+    recipient_token text not null
+);
+
+-- Returns the new run id, or null while another run is still open.
+create or replace function begin_assignment_run()
+returns bigint
+language plpgsql
+as $$
+declare
+    v_id bigint;
+begin
+    -- a run left open by a crashed worker stops blocking after 10 minutes
+    update assignment_runs
+       set finished_at = now()
+     where finished_at is null
+       and started_at < now() - interval '10 minutes';
+    delete from assignments_staging s
+     using assignment_runs r
+     where s.run_id = r.id and r.finished_at is not null;
+
+    insert into assignment_runs default values returning id into v_id;
+    return v_id;
+exception when unique_violation then
+    return null;
+end;
+$$;
+
+-- Replaces assignments and votes with the staged run and moves to token_reveal.
+create or replace function publish_assignment_run(p_run_id bigint)
+returns integer
+language plpgsql
+as $$
+declare
+    v_count integer;
+begin
+    perform 1 from assignment_runs where id = p_run_id and finished_at is null for update;
+    if not found then
+        raise exception 'assignment run % is not open', p_run_id;
+    end if;
+
+    delete from votes where true;
+    delete from assignments where true;
+    insert into assignments (santa_email, recipient_email, recipient_token)
+        select santa_email, recipient_email, recipient_token
+          from assignments_staging
+         where run_id = p_run_id;
+    get diagnostics v_count = row_count;
+
+    delete from assignments_staging where run_id = p_run_id;
+    update assignment_runs set finished_at = now() where id = p_run_id;
+    update config set value = 'token_reveal' where key = 'stage';
+    return v_count;
+end;
+$$;
+
+create or replace function abort_assignment_run(p_run_id bigint)
+returns void
+language sql
+as $$
+    delete from assignments_staging where run_id = p_run_id;
+    update assignment_runs set finished_at = now() where id = p_run_id and finished_at is null;
+$$;
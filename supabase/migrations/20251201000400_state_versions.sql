@@ -0,0 +1,31 @@
+-- Change counters for the auto-refreshing dashboard.
+-- Clients poll this two-row table (through a shared cache) instead of
+-- re-reading config and participants, and only rerun when a counter moved.
+
+create table if not exists state_versions (
+    name text primary key,
+    version bigint not null default 0
+);
+
+insert into state_versions (name) values ('config'), ('participants')
+    on conflict (name) do nothing;
+
+create or replace function bump_state_version()
+returns trigger
+language plpgsql
+as $$
+begin
+    update state_versions set version = version + 1 where name = tg_table_name;
+    return null;
+end;
+$$;
+
+drop trigger if exists config_bump_version on config;
+create trigger config_bump_version
+    after insert or update or delete on config
+    for each statement execute function bump_state_version();
+
+drop trigger if exists participants_bump_version on participants;
+create trigger participants_bump_version
+    after insert or update or delete on participants
+    for each statement execute function bump_state_version();
@@ -0,0 +1,31 @@
+-- Admin Participant Status.
+-- The cockpit used to download every participant and every assignment and
+-- join them in Python. participant_status does the join in Postgres and only
+-- carries the columns the table shows; participant_progress() reduces the
+-- whole event to one row of counters, so live progress costs a single row.
+
+create or replace view participant_status as
+select p.email,
+       p.name,
+       a.recipient_token,
+       a.status,
+       coalesce(a.guess_count, 0) as guess_count,
+       coalesce(a.is_correct_guess, false) as is_correct_guess,
+       v.voter_email is not null as has_voted
+  from participants p
+  left join assignments a on a.recipient_email = p.email
+  left join votes v on v.voter_email = p.email
+ where not p.is_admin;
+
+create or replace function participant_progress()
+returns table (participants bigint, received bigint, opened bigint, guessed bigint, voted bigint)
+language sql
+stable
+as $$
+    select count(*),
+           count(*) filter (where status in ('received', 'opened', 'revealed')),
+           count(*) filter (where status in ('opened', 'revealed')),
+           count(*) filter (where is_correct_guess),
+           count(*) filter (where has_voted)
+      from participant_status;
+$$;
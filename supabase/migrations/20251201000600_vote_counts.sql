@@ -0,0 +1,49 @@
+-- Star Game tally.
+-- Every grand_reveal rerun used to download the whole votes table and count it
+-- in pandas. vote_counts keeps one counter row per candidate, maintained by
+-- row triggers on votes, so the winner is a one-row index read.
+--
+-- Ties go to the candidate who reached the tied count first: last_vote_seq is
+-- the ordinal of the vote that brought them to it. Email breaks any rest.
+
+create sequence if not exists vote_seq;
+
+create table if not exists vote_counts (
+    voted_for_email text primary key,
+    votes integer not null default 0,
+    last_vote_seq bigint not null
+);
+
+create index if not exists vote_counts_ranking_idx
+    on vote_counts (votes desc, last_vote_seq, voted_for_email);
+
+create or replace function count_vote()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op = 'INSERT' then
+        insert into vote_counts (voted_for_email, votes, last_vote_seq)
+            values (new.voted_for_email, 1, nextval('vote_seq'))
+        on conflict (voted_for_email) do update
+            set votes = vote_counts.votes + 1,
+                last_vote_seq = excluded.last_vote_seq;
+    else
+        update vote_counts set votes = votes - 1 where voted_for_email = old.voted_for_email;
+        delete from vote_counts where voted_for_email = old.voted_for_email and votes <= 0;
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists votes_count_vote on votes;
+create trigger votes_count_vote
+    after insert or delete on votes
+    for each row execute function count_vote();
+
+-- Backfill from votes already cast
+insert into vote_counts (voted_for_email, votes, last_vote_seq)
+    select voted_for_email, count(*), nextval('vote_seq')
+      from votes
+     group by voted_for_email
+on conflict (voted_for_email) do nothing;
@@ -0,0 +1,70 @@
+-- Star Game profile browser.
+-- Voters used to receive every participant row and pick from a numbered list
+-- in signup order. star_profiles_page() hands out one page at a time of just
+-- the three star answers and an opaque profile_id, in an order shuffled per
+-- voter (md5 of voter and profile), so neither the payload nor the order
+-- reveals who wrote what. vote_for_profile() turns the id back into an email
+-- on the server.
+
+create extension if not exists pgcrypto;
+
+alter table participants add column if not exists profile_id uuid not null default gen_random_uuid();
+
+create unique index if not exists participants_profile_id_idx on participants (profile_id);
+
+create or replace function star_profiles_page(
+    p_voter_email text, p_skip_winners integer, p_after text default null, p_limit integer default 10)
+returns table (profile_id uuid, star_q1 text, star_q2 text, star_q3 text, sort_key text)
+language sql
+stable
+as $$
+    select p.profile_id, p.star_q1, p.star_q2, p.star_q3,
+           md5(p_voter_email || ':' || p.profile_id::text) as sort_key
+      from participants p
+     where not p.is_admin
+       and p.email <> p_voter_email
+       and p.email not in (
+           select recipient_email from assignments
+            where is_correct_guess and guess_timestamp is not null
+            order by guess_timestamp, guess_seq
+            limit p_skip_winners)
+       and (p_after is null or md5(p_voter_email || ':' || p.profile_id::text) > p_after)
+     order by sort_key
+     limit p_limit;
+$$;
+
+-- One vote per voter: vote_for_profile() relies on this for "on conflict do
+-- nothing", so a double click cannot count twice. Extra votes already cast
+-- are dropped first (the vote_counts trigger keeps the tally in step).
+delete from votes a
+ using votes b
+ where a.voter_email = b.voter_email
+   and a.ctid > b.ctid;
+
+create unique index if not exists votes_voter_email_idx on votes (voter_email);
+
+-- The Speed Winner exclusion is checked again at vote time: a voter's page may
+-- predate a correct guess, and a Speed Winner may not vote or be voted for.
+drop function if exists vote_for_profile(text, uuid);
+
+create or replace function vote_for_profile(p_voter_email text, p_profile_id uuid, p_skip_winners integer)
+returns boolean
+language sql
+as $$
+    with winners as (
+        select recipient_email from assignments
+         where is_correct_guess and guess_timestamp is not null
+         order by guess_timestamp, guess_seq
+         limit p_skip_winners
+    ), cast_vote as (
+        insert into votes (voter_email, voted_for_email)
+            select p_voter_email, email
+              from participants
+             where profile_id = p_profile_id and email <> p_voter_email
+               and email not in (select recipient_email from winners)
+               and p_voter_email not in (select recipient_email from winners)
+        on conflict do nothing
+        returning 1
+    )
+    select exists (select 1 from cast_vote);
+$$;